@@ -0,0 +1,6 @@
+"""Sepix: an anonymous chat and inbox Telegram bot.
+
+Importing the package is side-effect free.  The bot is started with
+``python -m sepix`` (see :func:`sepix.cli.main`), and the application is
+built by :func:`sepix.app.build_application`.
+"""
@@ -0,0 +1,119 @@
+import time
+import logging
+from telegram.ext import (
+    ApplicationBuilder, CommandHandler, MessageHandler, CallbackQueryHandler,
+    filters, ConversationHandler, PicklePersistence, PersistenceInput
+)
+from telegram.request import HTTPXRequest
+
+from .db import prewarm_user_cache, load_active_pairs, close_connections, DB_MAINTENANCE_INTERVAL
+from .handlers import (
+    NAME, AGE, GENDER, SEND_MESSAGE, STATS_RECONCILE_INTERVAL,
+    start, get_name, get_age, set_gender, send_message_via_link, throttle_updates,
+    import_users, route_callback, route_message, show_user_info, debug_info, list_users,
+    show_stats, show_profile, add_test_user, search, unified_error_handler,
+    reconcile_stats_job, optimize_db_job, evict_idle_flood_buckets, sweep_idle_chats
+)
+from .profiling import current_profile, profiled
+from .sessions import track_chat, IDLE_SWEEP_INTERVAL
+from .throttle import FLOOD_IDLE_EVICT
+
+logger = logging.getLogger(__name__)
+STATE_FILE = 'sepix_state.pickle'
+
+class ProfiledRequest(HTTPXRequest):
+    """HTTPXRequest that charges Bot API round trips to the update being profiled."""
+
+    async def do_request(self, *args, **kwargs):
+        record = current_profile.get()
+        if record is None:
+            return await super().do_request(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return await super().do_request(*args, **kwargs)
+        finally:
+            record['net'] += time.perf_counter() - started
+
+def instrument_handlers(application):
+    """Wrap every registered handler callback, including those inside conversations."""
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            if isinstance(handler, ConversationHandler):
+                nested = handler.entry_points + handler.fallbacks + [h for state in handler.states.values() for h in state]
+            else:
+                nested = [handler]
+            for inner in nested:
+                inner.callback = profiled(inner.callback)
+
+async def on_startup(application):
+    prewarm_user_cache()
+    now = time.monotonic()
+    pairs = load_active_pairs()
+    for a, b in pairs:
+        track_chat(a, b, now)
+    logger.info(f"Tracking {len(pairs)} active chats for idle timeout")
+
+async def on_shutdown(application):
+    # Closing the last connection checkpoints the WAL and removes the -wal file.
+    close_connections()
+    logger.info(f"Bot stopped; conversation state saved to {STATE_FILE}")
+
+def build_application(token):
+    """Build the bot application with every handler and periodic job registered."""
+    # Conversation states and user_data (reply_to, awaiting_info, gender_choice)
+    # survive restarts; run_polling drains in-flight updates on SIGTERM before
+    # the final snapshot is written.
+    persistence = PicklePersistence(
+        filepath=STATE_FILE,
+        store_data=PersistenceInput(bot_data=False, chat_data=False, callback_data=False),
+        update_interval=30
+    )
+    application = (
+        ApplicationBuilder()
+        .token(token)
+        .request(ProfiledRequest(connection_pool_size=256))
+        .persistence(persistence)
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+        .build()
+    )
+
+    conv_handler = ConversationHandler(
+        entry_points=[CommandHandler("start", start)],
+        states={
+            NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_name)],
+            AGE: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_age)],
+            GENDER: [CallbackQueryHandler(set_gender, pattern="^gender_")],
+            SEND_MESSAGE: [MessageHandler(filters.ALL & ~filters.COMMAND, send_message_via_link)]
+        },
+        fallbacks=[],
+        name="registration",
+        persistent=True
+    )
+
+    application.add_handler(MessageHandler(filters.ALL & ~filters.COMMAND, throttle_updates), group=-1)
+    application.add_handler(conv_handler)
+
+    application.add_handler(MessageHandler(filters.Document.ALL & filters.CaptionRegex(r"^/import_users"), import_users))
+    application.add_handler(CallbackQueryHandler(route_callback))
+    application.add_handler(MessageHandler(filters.ALL & ~filters.COMMAND, route_message))
+    application.add_handler(CommandHandler("info", show_user_info))
+    application.add_handler(CommandHandler("search", search))
+    application.add_handler(CommandHandler("debug_info", debug_info))
+    application.add_handler(CommandHandler("list_users", list_users))
+    application.add_handler(CommandHandler("stats", show_stats))
+    application.add_handler(CommandHandler("profile", show_profile))
+    application.add_handler(CommandHandler("add_test_user", add_test_user))
+
+    application.add_error_handler(unified_error_handler)
+    instrument_handlers(application)
+
+    if application.job_queue:
+        application.job_queue.run_repeating(reconcile_stats_job, interval=STATS_RECONCILE_INTERVAL, first=STATS_RECONCILE_INTERVAL)
+        application.job_queue.run_repeating(optimize_db_job, interval=DB_MAINTENANCE_INTERVAL, first=DB_MAINTENANCE_INTERVAL)
+        application.job_queue.run_repeating(evict_idle_flood_buckets, interval=FLOOD_IDLE_EVICT, first=FLOOD_IDLE_EVICT)
+        application.job_queue.run_repeating(sweep_idle_chats, interval=IDLE_SWEEP_INTERVAL, first=IDLE_SWEEP_INTERVAL)
+    else:
+        logger.warning("JobQueue unavailable (install python-telegram-bot[job-queue]); periodic jobs are disabled.")
+
+    return application
@@ -0,0 +1,185 @@
+"""Benchmarks for the database presets, message search and update dispatch.
+
+Run with ``python -m sepix bench_db [users] [rounds]``,
+``python -m sepix bench_search [messages] [owners]`` or
+``python -m sepix bench_dispatch [rounds]``.
+"""
+import itertools
+import os
+import random
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from . import db
+
+GENDERS = ["مرد", "زن"]
+
+def run_query_mix(users, rounds, rng):
+    """Replay a registration/chat/inbox mix and return the number of operations."""
+    ops = 0
+    for _ in range(rounds):
+        chat_id = rng.randrange(users)
+        partner_id = rng.randrange(users)
+
+        db.user_cache.clear()
+        db.load_user(chat_id)
+        db.get_users_by_gender(chat_id, rng.choice(GENDERS))
+        db.save_user(chat_id, chatting_with=partner_id)
+        ops += 3
+
+        for _ in range(4):
+            db.store_message(partner_id, chat_id, "کاربر ناشناس", f"پیام آزمایشی {rng.random()}", 'text', None)
+            db.load_unread_count(partner_id)
+            ops += 2
+
+        unread = db.load_unread_messages(partner_id)
+        if unread:
+            db.mark_messages_read(partner_id, unread[-1][0])
+        db.delete_chat_relation(chat_id)
+        ops += 3
+    return ops
+
+@contextmanager
+def temp_database(profile):
+    """Point sepix.db at a fresh database in a temporary directory for the duration."""
+    old_path, old_settings = db.db_path, dict(db.db_settings)
+    with tempfile.TemporaryDirectory() as tmp:
+        db.close_connections()
+        db.db_path = os.path.join(tmp, f'bench_{profile}.db')
+        db.db_settings.clear()
+        db.db_settings.update(db.load_db_settings({'SEPIX_DB_PROFILE': profile}))
+        try:
+            db.ensure_schema()
+            yield db.db_path
+        finally:
+            db.close_connections()
+            db.schema_checked.discard(db.db_path)
+            db.db_path = old_path
+            db.db_settings.clear()
+            db.db_settings.update(old_settings)
+            db.user_cache.clear()
+
+def bench_preset(profile, users, rounds, seed=0):
+    """Run the query mix against a fresh database using the given preset."""
+    with temp_database(profile):
+        rng = random.Random(seed)
+        db.bulk_import_users(
+            (chat_id, f"user{chat_id}", rng.randint(18, 60), rng.choice(GENDERS)) for chat_id in range(users)
+        )
+        start = time.perf_counter()
+        ops = run_query_mix(users, rounds, rng)
+        elapsed = time.perf_counter() - start
+        db.optimize_db()
+    return ops, elapsed
+
+def bench_db_cli(argv):
+    users = int(argv[0]) if argv else 2000
+    rounds = int(argv[1]) if len(argv) > 1 else 500
+    for profile in db.DB_PRESETS:
+        ops, elapsed = bench_preset(profile, users, rounds)
+        print(f"{profile:>8}: {ops} ops in {elapsed:.3f}s ({ops / elapsed:,.0f} ops/sec)")
+    return 0
+
+SEARCH_VOCABULARY = 50000
+SEARCH_WORDS_PER_MESSAGE = 8
+SEARCH_QUERIES = 50
+SEARCH_DEEP_PAGE = 100
+
+def search_word(rank):
+    return f"w{rank}"
+
+def search_owner(rng, owners):
+    """Pick an owner with a heavy skew towards low ids; odd ids are negative like group chats."""
+    k = int(owners * rng.random() ** 3) + 1
+    return -k if k % 2 else k
+
+def generate_messages(count, owners, rng):
+    # Zipf-like word frequencies: rank r is drawn with weight 1/r.
+    ranks = range(1, SEARCH_VOCABULARY + 1)
+    cum_weights = list(itertools.accumulate(1 / rank for rank in ranks))
+    for _ in range(count):
+        words = rng.choices(ranks, cum_weights=cum_weights, k=SEARCH_WORDS_PER_MESSAGE)
+        yield (search_owner(rng, owners), 0, "کاربر ناشناس", ' '.join(map(search_word, words)), 'text')
+
+def bench_search(messages, owners, seed=0):
+    """Load messages through the FTS triggers and time search_messages, returning per-case latencies in ms."""
+    page_size = 5  # handlers.SEARCH_PAGE_SIZE, without importing telegram
+    cases = {
+        'common word': lambda rng: (search_word(1), 0),
+        'rare word': lambda rng: (search_word(rng.randint(SEARCH_VOCABULARY // 2, SEARCH_VOCABULARY)), 0),
+        'two words': lambda rng: (f"{search_word(2)} {search_word(rng.randint(10, 100))}", 0),
+        'deep page': lambda rng: (search_word(1), SEARCH_DEEP_PAGE * page_size),
+    }
+    with temp_database('fast'):
+        rng = random.Random(seed)
+        start = time.perf_counter()
+        with db.connect() as conn:
+            conn.executemany('''INSERT INTO messages (owner_id, sender_id, sender_name, message, message_type)
+                                VALUES (?, ?, ?, ?, ?)''', generate_messages(messages, owners, rng))
+        load_elapsed = time.perf_counter() - start
+        db.optimize_db()
+
+        timings = {}
+        for name, make_query in cases.items():
+            latencies = []
+            for i in range(SEARCH_QUERIES):
+                text, offset = make_query(rng)
+                # Always include the heaviest inbox, owner -1, as the worst case.
+                owner_id = search_owner(rng, owners) if i else -1
+                started = time.perf_counter()
+                db.search_messages(owner_id, text, page_size + 1, offset)
+                latencies.append((time.perf_counter() - started) * 1000)
+            timings[name] = latencies
+    return load_elapsed, timings
+
+def bench_search_cli(argv):
+    messages = int(argv[0]) if argv else 1000000
+    owners = int(argv[1]) if len(argv) > 1 else 10000
+    load_elapsed, timings = bench_search(messages, owners)
+    print(f"Loaded {messages} messages for {owners} owners in {load_elapsed:.1f}s "
+          f"({load_elapsed / messages * 1e6:.1f}us per message)")
+    for name, latencies in timings.items():
+        print(f"{name:>12}: median {statistics.median(latencies):.2f}ms, max {max(latencies):.2f}ms "
+              f"over {len(latencies)} queries")
+    return 0
+
+def match_handlers(application, update):
+    """Pick the first matching handler in each group, as Application.process_update does."""
+    matched = []
+    for group in sorted(application.handlers):
+        for handler in application.handlers[group]:
+            check = handler.check_update(update)
+            if check is not None and check is not False:
+                matched.append(handler)
+                break
+    return matched
+
+def bench_dispatch_cli(argv):
+    rounds = int(argv[0]) if argv else 100000
+    # The telegram stack is only needed for this benchmark.
+    from telegram import CallbackQuery, Chat, Message, Update, User
+    from .app import build_application
+    from .handlers import resolve_message, resolve_callback
+
+    application = build_application("0:bench")
+    user = User(1, "bench", False)
+    chat = Chat(1, Chat.PRIVATE)
+    context = SimpleNamespace(user_data={})
+    relay = Update(1, message=Message(1, datetime.now(timezone.utc), chat, from_user=user, text="سلام"))
+    callback = Update(2, callback_query=CallbackQuery("1", user, "bench", data="reply_77"))
+
+    cases = {
+        'relay': lambda: (match_handlers(application, relay), resolve_message(relay, context)),
+        'callback': lambda: (match_handlers(application, callback), resolve_callback(callback.callback_query.data)),
+    }
+    for name, dispatch in cases.items():
+        start = time.perf_counter()
+        for _ in range(rounds):
+            dispatch()
+        elapsed = time.perf_counter() - start
+        print(f"{name:>8}: {elapsed / rounds * 1e6:.2f}us per update over {rounds} updates")
+    return 0
@@ -0,0 +1,64 @@
+import csv
+import os
+import sys
+import logging
+
+from . import db
+
+logger = logging.getLogger(__name__)
+
+def import_users_cli(argv):
+    if not argv:
+        print("Usage: python -m sepix import_users <users.csv|users.jsonl|users.json> [db_path]")
+        return 1
+
+    file_path = argv[0]
+    if len(argv) > 1:
+        db.db_path = argv[1]
+    db.ensure_schema()
+
+    counts = {'skipped': 0}
+    try:
+        with open(file_path, encoding='utf-8-sig') as f:
+            rows = db.parse_users_file(f.read(), db.users_file_format(file_path), counts)
+            inserted, elapsed = db.bulk_import_users(rows)
+    except (UnicodeDecodeError, ValueError, csv.Error) as e:
+        print(f"Invalid users file {file_path}: {e}")
+        return 1
+
+    rate = inserted / elapsed if elapsed else inserted
+    print(f"Imported {inserted} users into {db.db_path} in {elapsed:.3f}s ({rate:,.0f} users/sec), "
+          f"skipped {counts['skipped']} invalid rows")
+    return 0
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.DEBUG
+    )
+
+    if argv and argv[0] == 'import_users':
+        return import_users_cli(argv[1:])
+    if argv and argv[0] == 'bench_db':
+        from .bench import bench_db_cli
+        logging.getLogger('sepix').setLevel(logging.INFO)
+        return bench_db_cli(argv[1:])
+    if argv and argv[0] == 'bench_search':
+        from .bench import bench_search_cli
+        logging.getLogger('sepix').setLevel(logging.INFO)
+        return bench_search_cli(argv[1:])
+    if argv and argv[0] == 'bench_dispatch':
+        from .bench import bench_dispatch_cli
+        # Per-update debug logging from telegram.ext would dominate the timing.
+        logging.getLogger().setLevel(logging.INFO)
+        return bench_dispatch_cli(argv[1:])
+
+    # The telegram stack is only needed to actually run the bot.
+    from .app import build_application
+
+    db.ensure_schema()
+    application = build_application(os.environ.get("BOT_TOKEN", ""))
+    logger.info("Bot is starting...")
+    application.run_polling()
+    return 0
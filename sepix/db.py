@@ -0,0 +1,549 @@
+import sqlite3
+import logging
+import csv
+import io
+import json
+import os
+import threading
+import time
+
+from .profiling import timed_db
+
+logger = logging.getLogger(__name__)
+db_path = 'telegram_users.db'
+GENDER_STAT_KEYS = {"مرد": "male", "زن": "female"}
+USER_CACHE_SIZE = 10000
+user_cache = {}
+SCHEMA_VERSION = 4
+schema_checked = set()
+
+# "durable" matches SQLite's own defaults; "fast" keeps commits crash-safe
+# through WAL but only fsyncs at checkpoints, and serves reads from mmap.
+DB_PRESETS = {
+    'durable': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'cache_size': -2000,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+        'busy_timeout': 5000,
+    },
+    'fast': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    },
+}
+DB_SETTING_CHOICES = {
+    'journal_mode': {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'},
+    'synchronous': {'OFF', 'NORMAL', 'FULL', 'EXTRA'},
+    'temp_store': {'DEFAULT', 'FILE', 'MEMORY'},
+}
+DB_MAINTENANCE_INTERVAL = 3600
+db_settings = {}
+local_connections = threading.local()
+
+def load_db_settings(environ=os.environ):
+    """Resolve settings from SEPIX_DB_PROFILE, the SEPIX_DB_CONFIG JSON file and SEPIX_DB_<NAME> overrides."""
+    file_settings = {}
+    if environ.get('SEPIX_DB_CONFIG'):
+        with open(environ['SEPIX_DB_CONFIG'], encoding='utf-8') as f:
+            file_settings = json.load(f)
+
+    profile = environ.get('SEPIX_DB_PROFILE', file_settings.pop('profile', 'fast'))
+    if profile not in DB_PRESETS:
+        raise ValueError(f"Unknown database profile {profile!r}, expected one of {sorted(DB_PRESETS)}")
+    settings = dict(DB_PRESETS[profile])
+    settings.update(file_settings)
+    for key in DB_PRESETS[profile]:
+        if f'SEPIX_DB_{key.upper()}' in environ:
+            settings[key] = environ[f'SEPIX_DB_{key.upper()}']
+
+    # PRAGMA values cannot be bound as parameters, so validate them here.
+    for key, value in settings.items():
+        if key in DB_SETTING_CHOICES:
+            settings[key] = str(value).upper()
+            if settings[key] not in DB_SETTING_CHOICES[key]:
+                raise ValueError(f"Invalid {key} {value!r}, expected one of {sorted(DB_SETTING_CHOICES[key])}")
+        elif key in DB_PRESETS['fast']:
+            settings[key] = int(value)
+        else:
+            raise ValueError(f"Unknown database setting {key!r}")
+    return settings
+
+def connect():
+    """Return this thread's open connection to db_path, configured with db_settings."""
+    connections = local_connections.__dict__.setdefault('connections', {})
+    conn = connections.get(db_path)
+    if conn is None:
+        if not db_settings:
+            db_settings.update(load_db_settings())
+        conn = sqlite3.connect(db_path, timeout=db_settings['busy_timeout'] / 1000)
+        for key in ('journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store', 'busy_timeout'):
+            conn.execute(f"PRAGMA {key} = {db_settings[key]}")
+        connections[db_path] = conn
+        logger.debug(f"Opened {db_path} with {db_settings}")
+    return conn
+
+def close_connections():
+    for conn in local_connections.__dict__.pop('connections', {}).values():
+        conn.close()
+
+@timed_db
+def optimize_db():
+    """Refresh planner statistics and, in WAL mode, fold the log back into the database."""
+    conn = connect()
+    conn.execute("PRAGMA optimize")
+    if db_settings['journal_mode'] == 'WAL':
+        busy, log_frames, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        logger.debug(f"WAL checkpoint: busy={busy}, frames={log_frames}, checkpointed={checkpointed}")
+
+def ensure_schema():
+    """Create or migrate the schema once per database per process, keyed on PRAGMA user_version."""
+    if db_path in schema_checked:
+        return
+    with connect() as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version < SCHEMA_VERSION:
+        create_tables()
+        logger.info(f"Schema of {db_path} upgraded from version {version} to {SCHEMA_VERSION}")
+    schema_checked.add(db_path)
+
+def create_tables():
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''CREATE TABLE IF NOT EXISTS users (
+                            chat_id INTEGER PRIMARY KEY,
+                            name TEXT,
+                            age INTEGER,
+                            gender TEXT,
+                            chatting_with INTEGER,
+                            owner_id INTEGER
+                         )''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS messages (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            owner_id INTEGER,
+                            sender_id INTEGER,
+                            sender_name TEXT,
+                            message TEXT,
+                            message_type TEXT,
+                            media_file_id TEXT,
+                            is_read INTEGER DEFAULT 0,
+                            media_id INTEGER REFERENCES media(id)
+                         )''')
+        cursor.execute("PRAGMA table_info(messages)")
+        if 'media_id' not in [column[1] for column in cursor.fetchall()]:
+            cursor.execute("ALTER TABLE messages ADD COLUMN media_id INTEGER REFERENCES media(id)")
+        cursor.execute('''CREATE TABLE IF NOT EXISTS media (
+                            id INTEGER PRIMARY KEY,
+                            file_unique_id TEXT UNIQUE NOT NULL,
+                            file_id TEXT NOT NULL,
+                            media_type TEXT
+                         )''')
+        cursor.execute('''CREATE INDEX IF NOT EXISTS idx_messages_owner_unread
+                          ON messages (owner_id, is_read)''')
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'inbox'")
+        inbox_exists = cursor.fetchone() is not None
+        cursor.execute('''CREATE TABLE IF NOT EXISTS inbox (
+                            owner_id INTEGER PRIMARY KEY,
+                            unread INTEGER NOT NULL DEFAULT 0
+                         )''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS stats (
+                            key TEXT PRIMARY KEY,
+                            value INTEGER NOT NULL DEFAULT 0
+                         )''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS idle_notices (
+                            chat_id INTEGER PRIMARY KEY
+                         )''')
+        cursor.execute("SELECT 1 FROM stats LIMIT 1")
+        if cursor.fetchone() is None or not inbox_exists:
+            reconcile_stats(cursor)
+        create_search_index(cursor)
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+
+def owner_token(owner_id):
+    """Return the FTS token for an owner; '-' becomes 'n' so the tokenizer keeps it whole."""
+    return 'o' + str(owner_id).replace('-', 'n')
+
+def owner_token_sql(column):
+    return f"'o' || replace({column}, '-', 'n')"
+
+def create_search_index(cursor):
+    """Create the FTS5 index and its sync triggers, rebuilding one with an outdated owner token."""
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'view' AND name = 'messages_fts_source'")
+    row = cursor.fetchone()
+    if row is not None and owner_token_sql('owner_id') in row[0]:
+        return
+    for trigger in ('messages_fts_insert', 'messages_fts_delete', 'messages_fts_update'):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    cursor.execute("DROP VIEW IF EXISTS messages_fts_source")
+    cursor.execute("DROP TABLE IF EXISTS messages_fts")
+    try:
+        cursor.execute('''CREATE VIRTUAL TABLE messages_fts USING fts5(
+                            message, owner,
+                            content = 'messages_fts_source', content_rowid = 'id'
+                         )''')
+    except sqlite3.OperationalError as e:
+        logger.warning(f"FTS5 is unavailable, /search is disabled: {e}")
+        return
+    cursor.execute(f'''CREATE VIEW IF NOT EXISTS messages_fts_source AS
+                      SELECT id, message, {owner_token_sql('owner_id')} AS owner FROM messages WHERE message IS NOT NULL''')
+    cursor.execute(f'''CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages
+                      WHEN new.message IS NOT NULL BEGIN
+                          INSERT INTO messages_fts (rowid, message, owner) VALUES (new.id, new.message, {owner_token_sql('new.owner_id')});
+                      END''')
+    cursor.execute(f'''CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages
+                      WHEN old.message IS NOT NULL BEGIN
+                          INSERT INTO messages_fts (messages_fts, rowid, message, owner)
+                          VALUES ('delete', old.id, old.message, {owner_token_sql('old.owner_id')});
+                      END''')
+    cursor.execute(f'''CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF message, owner_id ON messages BEGIN
+                          INSERT INTO messages_fts (messages_fts, rowid, message, owner)
+                          SELECT 'delete', old.id, old.message, {owner_token_sql('old.owner_id')} WHERE old.message IS NOT NULL;
+                          INSERT INTO messages_fts (rowid, message, owner)
+                          SELECT new.id, new.message, {owner_token_sql('new.owner_id')} WHERE new.message IS NOT NULL;
+                      END''')
+    cursor.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+
+def bump_stats(cursor, **deltas):
+    """Apply counter deltas inside the caller's transaction."""
+    changes = [(key, delta) for key, delta in deltas.items() if delta]
+    if changes:
+        cursor.executemany('''INSERT INTO stats (key, value) VALUES (?, ?)
+                              ON CONFLICT(key) DO UPDATE SET value = value + excluded.value''', changes)
+
+def reconcile_user_stats(cursor):
+    """Recompute the counters derived from the users table."""
+    cursor.execute('''SELECT COUNT(*), SUM(gender = 'مرد'), SUM(gender = 'زن'), SUM(chatting_with IS NOT NULL)
+                      FROM users''')
+    users, male, female, chatting = cursor.fetchone()
+    counters = {'users': users, 'male': male, 'female': female, 'chatting': chatting}
+    cursor.executemany("INSERT OR REPLACE INTO stats (key, value) VALUES (?, ?)",
+                       [(key, value or 0) for key, value in counters.items()])
+    return counters
+
+def reconcile_stats(cursor):
+    """Recompute every counter from the base tables, correcting any drift."""
+    counters = reconcile_user_stats(cursor)
+    cursor.execute('''SELECT COUNT(*), SUM(is_read = 0 AND sender_name = 'کاربر ناشناس') FROM messages''')
+    total_messages, unread = cursor.fetchone()
+    counters.update(messages=total_messages, unread=unread)
+    cursor.executemany("INSERT OR REPLACE INTO stats (key, value) VALUES (?, ?)",
+                       [(key, counters[key] or 0) for key in ('messages', 'unread')])
+    cursor.execute("DELETE FROM inbox")
+    cursor.execute('''INSERT INTO inbox (owner_id, unread)
+                      SELECT owner_id, COUNT(*) FROM messages
+                      WHERE is_read = 0 AND sender_name = 'کاربر ناشناس'
+                      GROUP BY owner_id''')
+    logger.debug(f"Reconciled stats: {counters}")
+
+def gender_stat_deltas(old_gender, new_gender):
+    deltas = {}
+    if old_gender in GENDER_STAT_KEYS:
+        deltas[GENDER_STAT_KEYS[old_gender]] = -1
+    if new_gender in GENDER_STAT_KEYS:
+        key = GENDER_STAT_KEYS[new_gender]
+        deltas[key] = deltas.get(key, 0) + 1
+    return deltas
+
+@timed_db
+def refresh_stats():
+    with connect() as conn:
+        reconcile_stats(conn.cursor())
+        conn.commit()
+
+@timed_db
+def load_all_users():
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM users")
+        return cursor.fetchall()
+
+@timed_db
+def load_stats():
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT key, value FROM stats")
+        return dict(cursor.fetchall())
+
+def cache_user(user):
+    if len(user_cache) >= USER_CACHE_SIZE:
+        user_cache.pop(next(iter(user_cache)))
+    user_cache[user[0]] = user
+
+@timed_db
+def load_user(chat_id):
+    user = user_cache.get(chat_id)
+    if user is not None:
+        return user
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM users WHERE chat_id = ?", (chat_id,))
+        user = cursor.fetchone()
+        logger.debug(f"Loaded user {chat_id}: {user}")
+    if user:
+        cache_user(user)
+    return user
+
+@timed_db
+def prewarm_user_cache():
+    """Load everyone currently in a chat, since their rows are read on every relayed message."""
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM users WHERE chatting_with IS NOT NULL LIMIT ?", (USER_CACHE_SIZE,))
+        users = cursor.fetchall()
+    for user in users:
+        cache_user(user)
+    logger.info(f"Prewarmed user cache with {len(users)} users in active chats")
+
+@timed_db
+def save_user(chat_id, name=None, age=None, gender=None, chatting_with=None, owner_id='__NO_UPDATE__'):
+    user = load_user(chat_id)
+    with connect() as conn:
+        cursor = conn.cursor()
+        if user:
+            fields = []
+            values = []
+            if name is not None:
+                fields.append('name = ?')
+                values.append(name)
+            if age is not None:
+                fields.append('age = ?')
+                values.append(age)
+            if gender is not None:
+                fields.append('gender = ?')
+                values.append(gender)
+                if gender != user[3]:
+                    bump_stats(cursor, **gender_stat_deltas(user[3], gender))
+            if chatting_with is not None:
+                fields.append('chatting_with = ?')
+                values.append(chatting_with)
+                if user[4] is None:
+                    bump_stats(cursor, chatting=1)
+            if owner_id != '__NO_UPDATE__':
+                fields.append('owner_id = ?')
+                values.append(owner_id)
+            if fields:
+                query = f"UPDATE users SET {', '.join(fields)} WHERE chat_id = ?"
+                values.append(chat_id)
+                cursor.execute(query, values)
+                logger.debug(f"Updating user {chat_id} with {fields}")
+            else:
+                logger.debug(f"No fields to update for user {chat_id}")
+        else:
+            logger.debug(f"Inserting new user {chat_id} with name={name}, age={age}, gender={gender}, chatting_with={chatting_with}, owner_id={owner_id}")
+            cursor.execute('''INSERT INTO users (chat_id, name, age, gender, chatting_with, owner_id)
+                              VALUES (?, ?, ?, ?, ?, ?)''', (chat_id, name, age, gender, chatting_with, None if owner_id == '__NO_UPDATE__' else owner_id))
+            bump_stats(cursor, users=1, chatting=1 if chatting_with is not None else 0,
+                       **gender_stat_deltas(None, gender))
+        conn.commit()
+    user_cache.pop(chat_id, None)
+
+    updated_user = load_user(chat_id)
+    logger.debug(f"After update: {updated_user}")
+
+@timed_db
+def delete_chat_relation(chat_id):
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE users SET chatting_with = NULL WHERE chat_id = ? AND chatting_with IS NOT NULL", (chat_id,))
+        bump_stats(cursor, chatting=-cursor.rowcount)
+        conn.commit()
+    user_cache.pop(chat_id, None)
+
+def store_media(cursor, media_type, media):
+    """Return the media row id for a file, adding it the first time its file_unique_id is seen."""
+    cursor.execute('''INSERT INTO media (file_unique_id, file_id, media_type) VALUES (?, ?, ?)
+                      ON CONFLICT(file_unique_id) DO UPDATE SET file_id = excluded.file_id''',
+                   (media.file_unique_id, media.file_id, media_type))
+    cursor.execute("SELECT id FROM media WHERE file_unique_id = ?", (media.file_unique_id,))
+    return cursor.fetchone()[0]
+
+@timed_db
+def end_chats(pairs):
+    """Unpair (a, b) chats, queue idle notices and return the chat_ids actually unpaired."""
+    cleared = []
+    with connect() as conn:
+        cursor = conn.cursor()
+        for a, b in pairs:
+            for chat_id, partner_id in ((a, b), (b, a)):
+                cursor.execute("UPDATE users SET chatting_with = NULL WHERE chat_id = ? AND chatting_with = ?",
+                               (chat_id, partner_id))
+                if cursor.rowcount:
+                    cleared.append(chat_id)
+        bump_stats(cursor, chatting=-len(cleared))
+        cursor.executemany("INSERT OR IGNORE INTO idle_notices (chat_id) VALUES (?)", [(chat_id,) for chat_id in cleared])
+        conn.commit()
+    for a, b in pairs:
+        user_cache.pop(a, None)
+        user_cache.pop(b, None)
+    return cleared
+
+@timed_db
+def load_idle_notices(limit):
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT chat_id FROM idle_notices LIMIT ?", (limit,))
+        return [row[0] for row in cursor.fetchall()]
+
+@timed_db
+def drop_idle_notice(chat_id):
+    with connect() as conn:
+        conn.execute("DELETE FROM idle_notices WHERE chat_id = ?", (chat_id,))
+        conn.commit()
+
+def load_active_pairs():
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT chat_id, chatting_with FROM users WHERE chatting_with IS NOT NULL AND chat_id < chatting_with")
+        return cursor.fetchall()
+
+@timed_db
+def store_message(owner_id, sender_id, sender_name, message_text, message_type, media):
+    with connect() as conn:
+        cursor = conn.cursor()
+        media_id = store_media(cursor, message_type, media) if media else None
+        cursor.execute('''INSERT INTO messages (owner_id, sender_id, sender_name, message, message_type, media_id)
+                          VALUES (?, ?, ?, ?, ?, ?)''',
+                       (owner_id, sender_id, sender_name, message_text, message_type, media_id))
+        if sender_name == "کاربر ناشناس":
+            cursor.execute('''INSERT INTO inbox (owner_id, unread) VALUES (?, 1)
+                              ON CONFLICT(owner_id) DO UPDATE SET unread = unread + 1''', (owner_id,))
+            bump_stats(cursor, messages=1, unread=1)
+        else:
+            bump_stats(cursor, messages=1)
+        conn.commit()
+
+@timed_db
+def load_unread_messages(owner_id):
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''SELECT m.id, m.sender_id, m.sender_name, m.message, m.message_type,
+                                 COALESCE(media.file_id, m.media_file_id)
+                          FROM messages m LEFT JOIN media ON media.id = m.media_id
+                          WHERE m.owner_id = ? AND m.is_read = 0 AND m.sender_name = 'کاربر ناشناس'
+                          ORDER BY m.id''', (owner_id,))
+        return cursor.fetchall()
+
+@timed_db
+def mark_messages_read(owner_id, last_id):
+    """Mark an owner's anonymous messages read up to last_id; later arrivals stay unread."""
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''UPDATE messages SET is_read = 1
+                          WHERE owner_id = ? AND is_read = 0 AND sender_name = 'کاربر ناشناس' AND id <= ?''',
+                       (owner_id, last_id))
+        read = cursor.rowcount
+        bump_stats(cursor, unread=-read)
+        cursor.execute("UPDATE inbox SET unread = MAX(unread - ?, 0) WHERE owner_id = ?", (read, owner_id))
+        conn.commit()
+
+@timed_db
+def load_unread_count(owner_id):
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT unread FROM inbox WHERE owner_id = ?", (owner_id,))
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+@timed_db
+def search_messages(owner_id, text, limit, offset=0):
+    """Return an owner's messages matching every word of text, newest first, or None without FTS5."""
+    terms = ' '.join('"' + term.replace('"', '""') + '"' for term in text.split())
+    with connect() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''SELECT m.id, m.sender_name, m.message
+                              FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid
+                              WHERE messages_fts MATCH ?
+                              ORDER BY messages_fts.rowid DESC LIMIT ? OFFSET ?''',
+                           (f'owner:{owner_token(owner_id)} AND message : ({terms})', limit, offset))
+        except sqlite3.OperationalError as e:
+            logger.error(f"Search for {owner_id} failed: {e}")
+            return None
+        return cursor.fetchall()
+
+@timed_db
+def get_users_by_gender(chat_id, gender=None):
+    with connect() as conn:
+        cursor = conn.cursor()
+        if gender:
+            cursor.execute("""
+                SELECT chat_id, name 
+                FROM users 
+                WHERE gender = ? 
+                AND chatting_with IS NULL 
+                AND chat_id != ? 
+            """, (gender, chat_id))
+        else:
+            cursor.execute("""
+                SELECT chat_id, name 
+                FROM users 
+                WHERE chatting_with IS NULL 
+                AND chat_id != ?
+            """, (chat_id,))
+        users = cursor.fetchall()
+        logger.debug(f"Users found for gender '{gender}': {users}")
+        return users
+
+def users_file_format(file_name):
+    if file_name and file_name.endswith('.jsonl'):
+        return 'jsonl'
+    if file_name and file_name.endswith('.json'):
+        return 'json'
+    return 'csv'
+
+def parse_users_file(text, file_format, counts=None):
+    """Yield (chat_id, name, age, gender) rows from CSV, JSONL or JSON-array text, counting skipped ones."""
+    if file_format == 'jsonl':
+        records = (line for line in text.splitlines() if line.strip())
+    elif file_format == 'json':
+        records = json.loads(text)
+        if not isinstance(records, list):
+            raise ValueError("expected a JSON array of users")
+    else:
+        records = csv.DictReader(io.StringIO(text), skipinitialspace=True)
+
+    def field(record, key):
+        value = record.get(key)
+        return value.strip() if isinstance(value, str) else value
+
+    for record in records:
+        try:
+            if file_format == 'jsonl':
+                record = json.loads(record)
+            chat_id = int(record['chat_id'])
+            age = field(record, 'age')
+            age = int(age) if age not in (None, '') else None
+            gender = field(record, 'gender')
+        except (AttributeError, KeyError, TypeError, ValueError):
+            gender = None
+        if gender not in ["مرد", "زن"]:
+            if counts is not None:
+                counts['skipped'] = counts.get('skipped', 0) + 1
+            continue
+        yield chat_id, field(record, 'name'), age, gender
+
+@timed_db
+def bulk_import_users(rows):
+    """Insert many users in one non-durable transaction, returning (inserted, seconds)."""
+    started = time.perf_counter()
+    conn = sqlite3.connect(db_path, timeout=db_settings.get('busy_timeout', 5000) / 1000)
+    try:
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA cache_size = -65536")
+        with conn:
+            cursor = conn.executemany('''INSERT OR IGNORE INTO users (chat_id, name, age, gender)
+                                         VALUES (?, ?, ?, ?)''', rows)
+            inserted = cursor.rowcount
+            reconcile_user_stats(cursor)
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - started
+    logger.info(f"Bulk imported {inserted} users in {elapsed:.3f}s")
+    return inserted, elapsed
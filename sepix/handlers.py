@@ -1,148 +1,49 @@
-import sqlite3
+import asyncio
+import csv
 import logging
+import re
+import threading
+import time
 from telegram import (
     Update, InlineKeyboardButton, InlineKeyboardMarkup,
     KeyboardButton, ReplyKeyboardMarkup
 )
 from telegram.constants import ParseMode
-from telegram.ext import (
-    ApplicationBuilder, CommandHandler, MessageHandler, CallbackQueryHandler,
-    filters, ConversationHandler, ContextTypes
-)
+from telegram.ext import ConversationHandler, ContextTypes, ApplicationHandlerStop
 
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.DEBUG
+from .db import (
+    load_user, save_user, delete_chat_relation, end_chats, load_idle_notices, drop_idle_notice, get_users_by_gender, store_message,
+    load_unread_messages, mark_messages_read, load_unread_count, load_all_users, load_stats,
+    refresh_stats, users_file_format, parse_users_file, bulk_import_users, search_messages, optimize_db
+)
+from .profiling import profiling, profile_stats, label_profile, sample_stacks, format_profile_report, PROFILE_DUMP_FILE
+from .sessions import (
+    chat_sessions, track_chat, touch_chat, untrack_chat, collect_idle_chats,
+    IDLE_SWEEP_BATCH, IDLE_SWEEP_INTERVAL
 )
+from .texts import messages, MEDIA_LABELS
+from .throttle import flood_buckets, flood_stats, take_flood_token, evict_idle_buckets
+
 logger = logging.getLogger(__name__)
-db_path = 'telegram_users.db'
-
-def create_tables():
-    with sqlite3.connect(db_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''CREATE TABLE IF NOT EXISTS users (
-                            chat_id INTEGER PRIMARY KEY,
-                            name TEXT,
-                            age INTEGER,
-                            gender TEXT,
-                            chatting_with INTEGER,
-                            owner_id INTEGER
-                         )''')
-        cursor.execute('''CREATE TABLE IF NOT EXISTS messages (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            owner_id INTEGER,
-                            sender_id INTEGER,
-                            sender_name TEXT,
-                            message TEXT,
-                            message_type TEXT,
-                            media_file_id TEXT,
-                            is_read INTEGER DEFAULT 0
-                         )''')
-        conn.commit()
-
-create_tables()
-
-def load_user(chat_id):
-    with sqlite3.connect(db_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE chat_id = ?", (chat_id,))
-        user = cursor.fetchone()
-        logger.debug(f"Loaded user {chat_id}: {user}")
-        return user
-
-def save_user(chat_id, name=None, age=None, gender=None, chatting_with=None, owner_id='__NO_UPDATE__'):
-    user = load_user(chat_id)
-    with sqlite3.connect(db_path) as conn:
-        cursor = conn.cursor()
-        if user:
-            fields = []
-            values = []
-            if name is not None:
-                fields.append('name = ?')
-                values.append(name)
-            if age is not None:
-                fields.append('age = ?')
-                values.append(age)
-            if gender is not None:
-                fields.append('gender = ?')
-                values.append(gender)
-            if chatting_with is not None:
-                fields.append('chatting_with = ?')
-                values.append(chatting_with)
-            if owner_id != '__NO_UPDATE__':
-                fields.append('owner_id = ?')
-                values.append(owner_id)
-            if fields:
-                query = f"UPDATE users SET {', '.join(fields)} WHERE chat_id = ?"
-                values.append(chat_id)
-                cursor.execute(query, values)
-                logger.debug(f"Updating user {chat_id} with {fields}")
-            else:
-                logger.debug(f"No fields to update for user {chat_id}")
-        else:
-            logger.debug(f"Inserting new user {chat_id} with name={name}, age={age}, gender={gender}, chatting_with={chatting_with}, owner_id={owner_id}")
-            cursor.execute('''INSERT INTO users (chat_id, name, age, gender, chatting_with, owner_id)
-                              VALUES (?, ?, ?, ?, ?, ?)''', (chat_id, name, age, gender, chatting_with, None if owner_id == '__NO_UPDATE__' else owner_id))
-        conn.commit()
-    
-    updated_user = load_user(chat_id)
-    logger.debug(f"After update: {updated_user}")
-
-def delete_chat_relation(chat_id):
-    with sqlite3.connect(db_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute("UPDATE users SET chatting_with = NULL WHERE chat_id = ?", (chat_id,))
-        conn.commit()
-
-def get_users_by_gender(chat_id, gender=None):
-    with sqlite3.connect(db_path) as conn:
-        cursor = conn.cursor()
-        if gender:
-            cursor.execute("""
-                SELECT chat_id, name 
-                FROM users 
-                WHERE gender = ? 
-                AND chatting_with IS NULL 
-                AND chat_id != ? 
-            """, (gender, chat_id))
-        else:
-            cursor.execute("""
-                SELECT chat_id, name 
-                FROM users 
-                WHERE chatting_with IS NULL 
-                AND chat_id != ?
-            """, (chat_id,))
-        users = cursor.fetchall()
-        logger.debug(f"Users found for gender '{gender}': {users}")
-        return users
-
-messages = {
-    "welcome": "سلام خوش اومدی!👋 اسمت چیه؟",
-    "already_registered": "قبلا ثبت نام کردی",
-    "complete_registration": "فراینده ثبت نام رو کامل کن لطفا",
-    "enter_age": "ممنون {name}! حالا بگو چند سالته (فقط عدد وارد کن)",
-    "invalid_age": "فقط عدد وارد کن لطفا",
-    "select_gender": "جنسیتت رو انتخاب کن👨👩",
-    "gender_registered": "ثبت نام انجام شد برای شروع چت روی دکمه (شروع چت) کلیک کن😉",
-    "no_users_available": "هیچ کاربری در دسترس نیست چند دقیقه دیگه دوباره تلاش کن🙏",
-    "select_user": "کاربر مورد نظرت رو برای چت انتخاب کن",
-    "request_sent": "درخواستت به کاربر ارسال شد منتظر جوابش باش",
-    "chat_request": "{sender_name} میخواد باهات چت کنه قبول میکنی🤔?",
-    "chat_accepted": "چت بین شما و {receiver_name} شروع شد",
-    "chat_rejected": "{receiver_name} درخواست چت رو رد کرد☹️",
-    "not_connected": "به هیچ کاربر متصل نیستی برای شروع چت روی دکمه (شروع چت) کلیک کن",
-    "chat_ended": "چت به پایان رسید🔚",
-    "exit_chat_to_continue": "برای انجام کار های دیگه اول باید از چت خارج بشی",
-    "exit_chat_to_use_command": "برای اینکه از گزینه های دیگه استفاده کنی باید از چت خارج بشی",
-    "info_prompt": "برای تغییر اطلاعات یکی از گزینه های زیر رو انتخاب کن",
-    "link_generated": "لینکت برای اشتراک گذاری:\n{link}",
-    "new_message_notification": "پیام جدید داری! برای دیدن پیام روی دکمه (پیام‌های جدید) کلیک کن",
-    "you_are_not_in_chat": "الان تو چت با هیچ کسی نیستی",
-    "message_sent": "پیامت ارسال شد به {owner_name}",
-    "reply_prompt": "پیامت رو وارد کن تا به {receiver_name} جواب بدی",
-    "reply_received": "جوابت به {sender_name} ارسال شد",
-    "invalid_command": "دستور نامعتبر است."
-}
+STATS_RECONCILE_INTERVAL = 3600
+
+# animation must come before document: Telegram sets both for GIFs.
+MEDIA_TYPES = ['photo', 'animation', 'video', 'video_note', 'voice', 'audio', 'document', 'sticker']
+NOTIFY_WINDOW = 30
+pending_notifications = {}
+# Idle-chat notices are paced below Telegram's ~30 messages/sec bulk limit,
+# and a sweep sends at most half an interval's worth.
+IDLE_NOTIFY_RATE = 20
+IDLE_NOTIFY_BATCH = IDLE_NOTIFY_RATE * IDLE_SWEEP_INTERVAL // 2
+SEARCH_PAGE_SIZE = 5
+
+def extract_media(message):
+    """Return (message_type, media) for a message; media is None for plain text and unsupported types."""
+    for media_type in MEDIA_TYPES:
+        media = getattr(message, media_type)
+        if media:
+            return media_type, media[-1] if media_type == 'photo' else media
+    return "text", None
 
 NAME, AGE, GENDER, SEND_MESSAGE = range(4)
 
@@ -368,6 +269,7 @@ async def handle_chat_response(update: Update, context: ContextTypes.DEFAULT_TYP
     if action == 'accept':
         save_user(sender_id, chatting_with=receiver_id)
         save_user(receiver_id, chatting_with=sender_id)
+        track_chat(sender_id, receiver_id, time.monotonic())
 
         sender_name = sender_user[1]
         receiver_name = receiver_user[1]
@@ -420,6 +322,7 @@ async def handle_end_chat(update: Update, context: ContextTypes.DEFAULT_TYPE):
         chatting_with = user[4]
         delete_chat_relation(chat_id)
         delete_chat_relation(chatting_with)
+        untrack_chat(chat_id, chatting_with)
 
         user_after = load_user(chat_id)
         chatting_with_user = load_user(chatting_with)
@@ -435,6 +338,43 @@ async def handle_end_chat(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=main_keyboard(chatting_with_user)
         )
 
+async def send_media(bot, chat_id, message_type, file_id, caption=None, reply_markup=None):
+    kwargs = {message_type: file_id, 'reply_markup': reply_markup}
+    if message_type not in ('sticker', 'video_note'):
+        kwargs['caption'] = caption
+    return await getattr(bot, f"send_{message_type}")(chat_id=chat_id, **kwargs)
+
+async def send_unread_notification(bot, owner_id, count):
+    try:
+        await bot.send_message(chat_id=owner_id, text=messages["new_messages_notification"].format(count=count))
+    except Exception as e:
+        logger.error(f"Error sending new message notification to owner {owner_id}: {e}")
+
+async def notify_owner(context: ContextTypes.DEFAULT_TYPE, owner_id):
+    """Notify an owner about new anonymous messages at most once per NOTIFY_WINDOW.
+
+    The first message is announced right away; anything arriving while the
+    window is open is folded into a single follow-up carrying the unread count.
+    """
+    if owner_id in pending_notifications:
+        pending_notifications[owner_id] += 1
+        return
+    await send_unread_notification(context.bot, owner_id, load_unread_count(owner_id))
+    if context.job_queue:
+        pending_notifications[owner_id] = 0
+        context.job_queue.run_once(flush_owner_notification, NOTIFY_WINDOW, data=owner_id, name=f"notify_{owner_id}")
+
+async def flush_owner_notification(context: ContextTypes.DEFAULT_TYPE):
+    owner_id = context.job.data
+    arrived = pending_notifications.pop(owner_id, 0)
+    if not arrived:
+        return
+    count = load_unread_count(owner_id)
+    if count:
+        await send_unread_notification(context.bot, owner_id, count)
+        pending_notifications[owner_id] = 0
+        context.job_queue.run_once(flush_owner_notification, NOTIFY_WINDOW, data=owner_id, name=f"notify_{owner_id}")
+
 async def relay_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     sender_id = update.effective_chat.id
     user = load_user(sender_id)
@@ -447,35 +387,19 @@ async def relay_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             receiver_id = chatting_with
             receiver_user = load_user(receiver_id)
             if receiver_user:
+                touch_chat(sender_id, receiver_id, time.monotonic())
                 message_text = update.message.text if update.message.text else None
-                media_file_id = None
-                message_type = "text"
-
-                if update.message.photo:
-                    photo = update.message.photo[-1]
-                    media_file_id = photo.file_id
-                    message_type = "photo"
-                elif update.message.video:
-                    video = update.message.video
-                    media_file_id = video.file_id
-                    message_type = "video"
+                message_type, media = extract_media(update.message)
 
                 try:
-                    if message_type == "text" and message_text:
+                    if media:
+                        await send_media(context.bot, receiver_id, message_type, media.file_id, caption=f"{user[1]} ارسال کرد.")
+                    elif message_text:
                         await context.bot.send_message(chat_id=receiver_id, text=f"{user[1]}: {message_text}")
-                    elif message_type == "photo":
-                        await context.bot.send_photo(chat_id=receiver_id, photo=media_file_id, caption=f"{user[1]} ارسال کرد.")
-                    elif message_type == "video":
-                        await context.bot.send_video(chat_id=receiver_id, video=media_file_id, caption=f"{user[1]} ارسال کرد.")
                 except Exception as e:
                     logger.error(f"Error sending message from {sender_id} to {receiver_id}: {e}")
 
-                with sqlite3.connect(db_path) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute('''INSERT INTO messages (owner_id, sender_id, sender_name, message, message_type, media_file_id)
-                                      VALUES (?, ?, ?, ?, ?, ?)''',
-                                   (receiver_id, sender_id, user[1], message_text, message_type, media_file_id))
-                    conn.commit()
+                store_message(receiver_id, sender_id, user[1], message_text, message_type, media)
 
                 logger.info(f"Relayed {message_type} message from {sender_id} to {receiver_id}")
             else:
@@ -485,31 +409,13 @@ async def relay_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             owner_user = load_user(owner_id)
             if owner_user:
                 message_text = update.message.text if update.message.text else None
-                media_file_id = None
-                message_type = "text"
-
-                if update.message.photo:
-                    photo = update.message.photo[-1]
-                    media_file_id = photo.file_id
-                    message_type = "photo"
-                elif update.message.video:
-                    video = update.message.video
-                    media_file_id = video.file_id
-                    message_type = "video"
-
-                with sqlite3.connect(db_path) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute('''INSERT INTO messages (owner_id, sender_id, sender_name, message, message_type, media_file_id)
-                                      VALUES (?, ?, ?, ?, ?, ?)''',
-                                   (owner_id, sender_id, "کاربر ناشناس", message_text, message_type, media_file_id))
-                    conn.commit()
+                message_type, media = extract_media(update.message)
+
+                store_message(owner_id, sender_id, "کاربر ناشناس", message_text, message_type, media)
 
                 logger.info(f"Stored {message_type} message from {sender_id} to owner {owner_id}")
 
-                try:
-                    await context.bot.send_message(chat_id=owner_id, text=messages["new_message_notification"])
-                except Exception as e:
-                    logger.error(f"Error sending new message notification to owner {owner_id}: {e}")
+                await notify_owner(context, owner_id)
 
                 await update.message.reply_text(messages["message_sent"].format(owner_name=owner_user[1]))
 
@@ -528,30 +434,28 @@ async def handle_new_messages(update: Update, context: ContextTypes.DEFAULT_TYPE
     chat_id = update.effective_chat.id
     user = load_user(chat_id)
     if user and not user[5]:
-        with sqlite3.connect(db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''SELECT sender_id, sender_name, message, message_type, media_file_id FROM messages 
-                              WHERE owner_id = ? AND is_read = 0 AND sender_name = 'کاربر ناشناس' ''', (chat_id,))
-            new_messages = cursor.fetchall()
-
-            if new_messages:
-                for sender_id, sender_name, message, message_type, media_file_id in new_messages:
-                    keyboard = [
-                        [InlineKeyboardButton("پاسخ✍️", callback_data=f"reply_{sender_id}")]
-                    ]
-                    reply_markup = InlineKeyboardMarkup(keyboard)
-
-                    if message_type == "text":
-                        await update.message.reply_text(f"ناشناس: {message}", reply_markup=reply_markup)
-                    elif message_type == "photo":
-                        await update.message.reply_photo(photo=media_file_id, caption="ناشناس: ارسال یک عکس", reply_markup=reply_markup)
-                    elif message_type == "video":
-                        await update.message.reply_video(video=media_file_id, caption="ناشناس: ارسال یک ویدیو", reply_markup=reply_markup)
-
-                cursor.execute('''UPDATE messages SET is_read = 1 WHERE owner_id = ? AND is_read = 0 AND sender_name = 'کاربر ناشناس' ''', (chat_id,))
-                conn.commit()
-            else:
-                await update.message.reply_text("پیام جدیدی نداری")
+        if not load_unread_count(chat_id):
+            await update.message.reply_text("پیام جدیدی نداری")
+            return
+        new_messages = load_unread_messages(chat_id)
+
+        if new_messages:
+            for message_id, sender_id, sender_name, message, message_type, media_file_id in new_messages:
+                keyboard = [
+                    [InlineKeyboardButton("پاسخ✍️", callback_data=f"reply_{sender_id}")]
+                ]
+                reply_markup = InlineKeyboardMarkup(keyboard)
+
+                if message_type == "text":
+                    await update.message.reply_text(f"ناشناس: {message}", reply_markup=reply_markup)
+                elif media_file_id:
+                    await send_media(context.bot, chat_id, message_type, media_file_id,
+                                     caption=f"ناشناس: ارسال یک {MEDIA_LABELS.get(message_type, 'فایل')}",
+                                     reply_markup=reply_markup)
+
+            mark_messages_read(chat_id, new_messages[-1][0])
+        else:
+            await update.message.reply_text("پیام جدیدی نداری")
     else:
         await update.message.reply_text("دسترسی لازم رو نداری")
 
@@ -570,8 +474,7 @@ async def receive_reply(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if 'reply_to' in context.user_data:
         reply = update.message
         reply_text = reply.text if reply.text else None
-        reply_photo = reply.photo[-1].file_id if reply.photo else None
-        reply_video = reply.video.file_id if reply.video else None
+        reply_type, reply_media = extract_media(reply)
 
         sender_id = context.user_data.pop('reply_to', None)
         if sender_id:
@@ -585,16 +488,12 @@ async def receive_reply(update: Update, context: ContextTypes.DEFAULT_TYPE):
                             chat_id=sender_id,
                             text=f"پاسخ از {owner_user[1]}: {reply_text}"
                         )
-                    elif reply_photo:
-                        await context.bot.send_photo(
-                            chat_id=sender_id,
-                            photo=reply_photo,
-                            caption=f"پاسخ از {owner_user[1]}"
-                        )
-                    elif reply_video:
-                        await context.bot.send_video(
-                            chat_id=sender_id,
-                            video=reply_video,
+                    elif reply_media:
+                        await send_media(
+                            context.bot,
+                            sender_id,
+                            reply_type,
+                            reply_media.file_id,
                             caption=f"پاسخ از {owner_user[1]}"
                         )
                     else:
@@ -640,20 +539,6 @@ async def pagination_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
     await show_users(update, context, users_list, page, gender_choice)
     await query.answer()
 
-async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    data = query.data
-
-    if data.startswith('prev_') or data.startswith('next_'):
-        await pagination_handler(update, context)
-    elif data.startswith('change_'):
-        await change_user_info(update, context)
-    elif data.startswith('reply_'):
-        await handle_reply_button(update, context)
-    else:
-        logger.warning(f"Unknown callback data: {data}")
-        await query.answer("داده نامعتبر است.")
-
 async def change_user_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     info_type = query.data.split('_')[1]
@@ -706,6 +591,47 @@ async def process_user_info_change(update: Update, context: ContextTypes.DEFAULT
     else:
         await relay_message(update, context)
 
+async def throttle_updates(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat = update.effective_chat
+    if chat is None:
+        return
+    if take_flood_token(chat.id, time.monotonic()):
+        flood_stats['passed'] += 1
+        return
+    flood_stats['throttled'] += 1
+    logger.debug(f"Dropped update from {chat.id}: flood limit reached")
+    raise ApplicationHandlerStop
+
+async def evict_idle_flood_buckets(context: ContextTypes.DEFAULT_TYPE):
+    evicted = evict_idle_buckets(time.monotonic())
+    logger.debug(f"Evicted {evicted} idle flood buckets, {len(flood_buckets)} left")
+
+async def sweep_idle_chats(context: ContextTypes.DEFAULT_TYPE):
+    idle = collect_idle_chats(time.monotonic())
+    unpaired = 0
+    for start in range(0, len(idle), IDLE_SWEEP_BATCH):
+        unpaired += len(end_chats(idle[start:start + IDLE_SWEEP_BATCH]))
+    if idle:
+        logger.info(f"Unpaired {unpaired} users from {len(idle)} idle chats, {len(chat_sessions)} still active")
+    await send_idle_notices(context.bot)
+
+async def send_idle_notices(bot):
+    """Send up to IDLE_NOTIFY_BATCH queued idle notices; the rest wait for the next sweep, even across restarts."""
+    for chat_id in load_idle_notices(IDLE_NOTIFY_BATCH):
+        user = load_user(chat_id)
+        # The user may have started a new chat while the notice was queued.
+        if user and user[4] is None:
+            try:
+                await bot.send_message(
+                    chat_id=chat_id,
+                    text=messages["chat_idle_ended"],
+                    reply_markup=main_keyboard(user)
+                )
+            except Exception as e:
+                logger.error(f"Error notifying {chat_id} about idle chat end: {e}")
+            await asyncio.sleep(1 / IDLE_NOTIFY_RATE)
+        drop_idle_notice(chat_id)
+
 async def debug_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     user = load_user(chat_id)
@@ -728,10 +654,7 @@ async def list_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("دسترسی ندارید.")
         return
 
-    with sqlite3.connect(db_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users")
-        users = cursor.fetchall()
+    users = load_all_users()
 
     if users:
         message = "لیست کاربران:\n"
@@ -748,6 +671,76 @@ async def list_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         await update.message.reply_text("هیچ کاربری ثبت‌نام نکرده است.")
 
+async def show_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    admin_id = 1877238598
+    if update.effective_chat.id != admin_id:
+        await update.message.reply_text("دسترسی ندارید.")
+        return
+
+    stats = load_stats()
+    await update.message.reply_text(
+        "آمار ربات:\n"
+        f"کاربران ثبت‌نام‌شده: {stats.get('users', 0)}\n"
+        f"مرد: {stats.get('male', 0)}\n"
+        f"زن: {stats.get('female', 0)}\n"
+        f"چت‌های فعال: {stats.get('chatting', 0) // 2}\n"
+        f"پیام‌ها: {stats.get('messages', 0)}\n"
+        f"پیام‌های ناشناس خوانده‌نشده: {stats.get('unread', 0)}\n"
+        f"پیام‌های محدودشده (ضد اسپم): {flood_stats['throttled']} از {flood_stats['throttled'] + flood_stats['passed']}"
+    )
+
+async def show_profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    admin_id = 1877238598
+    if update.effective_chat.id != admin_id:
+        await update.message.reply_text("دسترسی ندارید.")
+        return
+
+    args = context.args
+    action = args[0] if args else 'show'
+    if action == 'on':
+        profiling['enabled'] = True
+        await update.message.reply_text("پروفایلینگ روشن شد.")
+    elif action == 'off':
+        profiling['enabled'] = False
+        await update.message.reply_text("پروفایلینگ خاموش شد.")
+    elif action == 'reset':
+        profile_stats.clear()
+        profiling['samples'] = None
+        await update.message.reply_text("آمار پروفایلینگ پاک شد.")
+    elif action == 'sample':
+        if profiling['sampling']:
+            await update.message.reply_text("نمونه‌برداری در حال اجراست.")
+            return
+        try:
+            seconds = min(int(args[1]), 120) if len(args) > 1 else 10
+        except ValueError:
+            await update.message.reply_text("استفاده صحیح: /profile sample <ثانیه>")
+            return
+        profiling['sampling'] = True
+        # Run in the background so updates keep flowing while they are sampled.
+        context.application.create_task(run_sampling(context.bot, update.effective_chat.id, seconds))
+        await update.message.reply_text(f"نمونه‌برداری به مدت {seconds} ثانیه شروع شد.")
+    elif action == 'dump':
+        with open(PROFILE_DUMP_FILE, 'w', encoding='utf-8') as f:
+            f.write(format_profile_report(limit=100))
+        with open(PROFILE_DUMP_FILE, 'rb') as f:
+            await update.message.reply_document(f, filename=PROFILE_DUMP_FILE)
+    else:
+        await update.message.reply_text(format_profile_report())
+
+async def run_sampling(bot, chat_id, seconds):
+    try:
+        profiling['samples'] = await asyncio.to_thread(sample_stacks, threading.main_thread().ident, seconds)
+    finally:
+        profiling['sampling'] = False
+    await bot.send_message(chat_id=chat_id, text=format_profile_report())
+
+async def reconcile_stats_job(context: ContextTypes.DEFAULT_TYPE):
+    refresh_stats()
+
+async def optimize_db_job(context: ContextTypes.DEFAULT_TYPE):
+    optimize_db()
+
 async def add_test_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
     admin_id = 826685726 
     if update.effective_chat.id != admin_id:
@@ -779,6 +772,87 @@ async def add_test_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
     save_user(test_chat_id, name=name, gender=gender)
     await update.message.reply_text(f"کاربر تستی {name} با chat_id {test_chat_id} اضافه شد.")
 
+async def import_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    admin_id = 826685726
+    if update.effective_chat.id != admin_id:
+        await update.message.reply_text("دسترسی ندارید.")
+        return
+
+    document = update.message.document
+    file_format = users_file_format(document.file_name)
+    telegram_file = await document.get_file()
+    data = await telegram_file.download_as_bytearray()
+
+    counts = {'skipped': 0}
+    try:
+        rows = parse_users_file(data.decode('utf-8-sig'), file_format, counts)
+        inserted, elapsed = bulk_import_users(rows)
+    except (UnicodeDecodeError, ValueError, csv.Error) as e:
+        logger.error(f"Bulk import from {document.file_name} failed: {e}")
+        await update.message.reply_text("فایل نامعتبر است. ستون‌ها: chat_id, name, age, gender")
+        return
+
+    rate = inserted / elapsed if elapsed else inserted
+    await update.message.reply_text(
+        f"{inserted} کاربر در {elapsed:.2f} ثانیه اضافه شد ({rate:,.0f} کاربر در ثانیه).\n"
+        f"{counts['skipped']} ردیف نامعتبر نادیده گرفته شد."
+    )
+
+def format_search_results(query_text, results, page):
+    has_next = len(results) > SEARCH_PAGE_SIZE
+    lines = [messages["search_results"].format(query=query_text, page=page + 1)]
+    for message_id, sender_name, message in results[:SEARCH_PAGE_SIZE]:
+        sender = "ناشناس" if sender_name == "کاربر ناشناس" else sender_name
+        snippet = message if len(message) <= 100 else message[:100] + "…"
+        lines.append(f"• {sender}: {snippet}")
+
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton("صفحه قبل", callback_data=f"search_{page - 1}"))
+    if has_next:
+        buttons.append(InlineKeyboardButton("صفحه بعد", callback_data=f"search_{page + 1}"))
+    return "\n".join(lines), InlineKeyboardMarkup([buttons]) if buttons else None
+
+async def search(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = update.effective_chat.id
+    query_text = " ".join(context.args)
+    if not query_text:
+        await update.message.reply_text("استفاده صحیح: /search <متن>")
+        return
+
+    # One extra row tells us whether there is a next page.
+    results = search_messages(chat_id, query_text, SEARCH_PAGE_SIZE + 1)
+    if results is None:
+        await update.message.reply_text("جستجو در حال حاضر در دسترس نیست.")
+        return
+    if not results:
+        await update.message.reply_text(messages["search_no_results"])
+        return
+
+    context.user_data['search_query'] = query_text
+    text, reply_markup = format_search_results(query_text, results, 0)
+    await update.message.reply_text(text, reply_markup=reply_markup)
+
+async def search_pagination_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    query_text = context.user_data.get('search_query')
+    try:
+        page = int(query.data.split('_')[1])
+    except (IndexError, ValueError):
+        logger.warning(f"Invalid search callback data: {query.data}")
+        await query.answer("داده نامعتبر است.")
+        return
+
+    if not query_text:
+        await query.answer("جستجو منقضی شده، دوباره /search بزن.")
+        return
+
+    results = search_messages(query.from_user.id, query_text, SEARCH_PAGE_SIZE + 1, page * SEARCH_PAGE_SIZE)
+    await query.answer()
+    if results:
+        text, reply_markup = format_search_results(query_text, results, page)
+        await query.edit_message_text(text, reply_markup=reply_markup)
+
 async def show_user_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     user = load_user(chat_id)
@@ -838,31 +912,13 @@ async def send_message_via_link(update: Update, context: ContextTypes.DEFAULT_TY
         owner_user = load_user(owner_id)
         if owner_user:
             message_text = update.message.text if update.message.text else None
-            media_file_id = None
-            message_type = "text"
-
-            if update.message.photo:
-                photo = update.message.photo[-1]
-                media_file_id = photo.file_id
-                message_type = "photo"
-            elif update.message.video:
-                video = update.message.video
-                media_file_id = video.file_id
-                message_type = "video"
-
-            with sqlite3.connect(db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''INSERT INTO messages (owner_id, sender_id, sender_name, message, message_type, media_file_id)
-                                  VALUES (?, ?, ?, ?, ?, ?)''',
-                               (owner_id, sender_id, "کاربر ناشناس", message_text, message_type, media_file_id))
-                conn.commit()
+            message_type, media = extract_media(update.message)
+
+            store_message(owner_id, sender_id, "کاربر ناشناس", message_text, message_type, media)
 
             logger.info(f"Stored {message_type} message from {sender_id} to owner {owner_id}")
 
-            try:
-                await context.bot.send_message(chat_id=owner_id, text=messages["new_message_notification"])
-            except Exception as e:
-                logger.error(f"Error sending new message notification to owner {owner_id}: {e}")
+            await notify_owner(context, owner_id)
 
             await update.message.reply_text(messages["message_sent"].format(owner_name=owner_user[1]))
 
@@ -879,48 +935,67 @@ async def send_message_via_link(update: Update, context: ContextTypes.DEFAULT_TY
         await update.message.reply_text("دسترسی لازم رو نداری.")
         return ConversationHandler.END
 
-if __name__ == '__main__':
-    BOT_TOKEN = ""
-
-    application = ApplicationBuilder().token(8195064054:AAEmSGt0JR6ery9VaGLVpi4wGzcMK_7CsQA).build()
-
-    conv_handler = ConversationHandler(
-        entry_points=[CommandHandler("start", start)],
-        states={
-            NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_name)],
-            AGE: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_age)],
-            GENDER: [CallbackQueryHandler(set_gender, pattern="^gender_")],
-            SEND_MESSAGE: [MessageHandler(filters.ALL & ~filters.COMMAND, send_message_via_link)]
-        },
-        fallbacks=[]
-    )
+# Reply-keyboard labels and callback-data prefixes are matched with a single
+# dict lookup; anything else falls through to the relay.  Each callback prefix
+# carries the pattern its suffix must match, so malformed data such as
+# "reply_abc" is rejected here instead of inside the handler.
+text_routes = {
+    "شروع چت": handle_connect,
+    "مرد👨": handle_gender_choice,
+    "زن👩": handle_gender_choice,
+    "شانسی🎲": handle_gender_choice,
+    "اتمام چت": handle_end_chat,
+    "اطلاعات شما": show_user_info,
+    "پیام‌های جدید": handle_new_messages,
+}
 
-    application.add_handler(conv_handler)
+NUMBER_SUFFIX = re.compile(r'\d+')
 
-    application.add_handler(MessageHandler(filters.Regex("^شروع چت$"), handle_connect))
-    application.add_handler(MessageHandler(filters.Regex("^(مرد👨|زن👩|شانسی🎲)$"), handle_gender_choice))
-    application.add_handler(MessageHandler(filters.Regex("^اتمام چت$"), handle_end_chat))
-    application.add_handler(MessageHandler(filters.Regex("^اطلاعات شما$"), show_user_info))
-    application.add_handler(MessageHandler(filters.Regex("^پیام‌های جدید$"), handle_new_messages))
-    application.add_handler(CallbackQueryHandler(handle_user_selection, pattern=r"^\d+$"))
-    application.add_handler(CallbackQueryHandler(handle_chat_response, pattern=r'^(accept|reject)_\d+$'))
-    application.add_handler(CallbackQueryHandler(handle_callback, pattern='^(change_(name|age|gender)|prev_\d+|next_\d+|reply_\d+)$'))
+callback_routes = {
+    'prev': (pagination_handler, NUMBER_SUFFIX),
+    'next': (pagination_handler, NUMBER_SUFFIX),
+    'change': (change_user_info, re.compile(r'name|age|gender')),
+    'reply': (handle_reply_button, NUMBER_SUFFIX),
+    'accept': (handle_chat_response, NUMBER_SUFFIX),
+    'reject': (handle_chat_response, NUMBER_SUFFIX),
+    'search': (search_pagination_handler, NUMBER_SUFFIX),
+}
 
-    async def unified_text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+def resolve_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    handler = text_routes.get(update.effective_message.text)
+    if handler is None:
         if 'reply_to' in context.user_data:
-            await receive_reply(update, context)
+            handler = receive_reply
         elif 'awaiting_info' in context.user_data:
-            await process_user_info_change(update, context)
+            handler = process_user_info_change
         else:
-            await relay_message(update, context)
-
-    application.add_handler(MessageHandler(filters.ALL & ~filters.COMMAND, unified_text_handler))
-    application.add_handler(CommandHandler("info", show_user_info))
-    application.add_handler(CommandHandler("debug_info", debug_info))
-    application.add_handler(CommandHandler("list_users", list_users))
-    application.add_handler(CommandHandler("add_test_user", add_test_user))
-
-    application.add_error_handler(unified_error_handler)
+            handler = relay_message
+    return handler
+
+def resolve_callback(data):
+    """Return the handler for callback data, or None if it is not well-formed."""
+    # isdecimal() matches exactly what \d does, unlike isdigit().
+    if data.isdecimal():
+        return handle_user_selection
+    prefix, _, suffix = data.partition('_')
+    route = callback_routes.get(prefix)
+    if route and route[1].fullmatch(suffix):
+        return route[0]
+    return None
+
+async def route_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    handler = resolve_message(update, context)
+    label_profile(handler.__name__)
+    await handler(update, context)
+
+async def route_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    data = query.data or ''
 
-    logger.info("Bot is starting...")
-    application.run_polling()
+    handler = resolve_callback(data)
+    if handler:
+        label_profile(handler.__name__)
+        await handler(update, context)
+    else:
+        logger.warning(f"Unknown callback data: {data}")
+        await query.answer("داده نامعتبر است.")
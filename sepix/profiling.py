@@ -0,0 +1,105 @@
+import os
+import sys
+import time
+import logging
+import functools
+import contextvars
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+SLOW_UPDATE_MS = 500
+PROFILE_SAMPLE_INTERVAL = 0.005
+PROFILE_DUMP_FILE = 'sepix_profile.txt'
+profiling = {'enabled': os.environ.get('SEPIX_PROFILE') == '1', 'sampling': False, 'samples': None}
+profile_stats = {}
+current_profile = contextvars.ContextVar('current_profile', default=None)
+
+def timed_db(func):
+    """Charge time spent in a database helper to the update being profiled."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        record = current_profile.get()
+        if record is None or record['in_db']:
+            return func(*args, **kwargs)
+        record['in_db'] = True
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record['db'] += time.perf_counter() - started
+            record['in_db'] = False
+    return wrapper
+
+def profiled(callback):
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        if not profiling['enabled']:
+            return await callback(update, context)
+        record = {'handler': callback.__name__, 'db': 0.0, 'net': 0.0, 'in_db': False}
+        token = current_profile.set(record)
+        # Handlers run on the event-loop thread; process_time() would also
+        # charge them for the /profile sampler thread and other workers.
+        wall_started, cpu_started = time.perf_counter(), time.thread_time()
+        try:
+            return await callback(update, context)
+        finally:
+            wall = time.perf_counter() - wall_started
+            cpu = time.thread_time() - cpu_started
+            current_profile.reset(token)
+            record_profile(record['handler'], wall, cpu, record['db'], record['net'])
+    return wrapper
+
+def label_profile(name):
+    """Attribute the current update to the handler a router dispatched it to."""
+    record = current_profile.get()
+    if record is not None:
+        record['handler'] = name
+
+def record_profile(name, wall, cpu, db, net):
+    entry = profile_stats.setdefault(name, [0, 0.0, 0.0, 0.0, 0.0, 0.0])
+    entry[0] += 1
+    entry[1] += wall
+    entry[2] += cpu
+    entry[3] += db
+    entry[4] += net
+    entry[5] = max(entry[5], wall)
+    if wall * 1000 >= SLOW_UPDATE_MS:
+        logger.warning(f"Slow update in {name}: {wall * 1000:.0f}ms "
+                       f"(cpu {cpu * 1000:.0f}ms, db {db * 1000:.0f}ms, network {net * 1000:.0f}ms)")
+
+def sample_stacks(thread_id, seconds):
+    """Sample the given thread's stack every PROFILE_SAMPLE_INTERVAL for a while.
+
+    Returns (samples taken, inclusive counts, self counts) keyed by function.
+    """
+    inclusive, own = Counter(), Counter()
+    taken = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is not None:
+            taken += 1
+            own[f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}"] += 1
+            seen = set()
+            while frame is not None:
+                seen.add(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+                frame = frame.f_back
+            inclusive.update(seen)
+        time.sleep(PROFILE_SAMPLE_INTERVAL)
+    return taken, inclusive, own
+
+def format_profile_report(limit=15):
+    lines = [f"profiling: {'on' if profiling['enabled'] else 'off'}",
+             "handler: count, avg ms, max ms, cpu %, db %, network %"]
+    for name, (count, wall, cpu, db, net, max_wall) in sorted(profile_stats.items(), key=lambda item: -item[1][1])[:limit]:
+        total = wall or 1
+        lines.append(f"{name}: {count}, {wall / count * 1000:.1f}, {max_wall * 1000:.0f}, "
+                     f"{100 * cpu / total:.0f}, {100 * db / total:.0f}, {100 * net / total:.0f}")
+    if profiling['samples']:
+        taken, inclusive, own = profiling['samples']
+        lines.append(f"\nsampling: {taken} samples")
+        lines.append("inclusive:")
+        lines += [f"{100 * count / taken:5.1f}% {name}" for name, count in inclusive.most_common(limit)]
+        lines.append("self:")
+        lines += [f"{100 * count / taken:5.1f}% {name}" for name, count in own.most_common(limit)]
+    return "\n".join(lines)
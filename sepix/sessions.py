@@ -0,0 +1,44 @@
+import heapq
+
+CHAT_IDLE_TIMEOUT = 1800
+IDLE_SWEEP_INTERVAL = 60
+IDLE_SWEEP_BATCH = 500
+chat_sessions = {}
+chat_deadlines = []
+
+def track_chat(a, b, now):
+    pair = (min(a, b), max(a, b))
+    deadline = now + CHAT_IDLE_TIMEOUT
+    chat_sessions[pair] = [now, deadline]
+    heapq.heappush(chat_deadlines, (deadline, pair))
+
+def touch_chat(a, b, now):
+    session = chat_sessions.get((min(a, b), max(a, b)))
+    if session:
+        session[0] = now
+    else:
+        track_chat(a, b, now)
+
+def untrack_chat(a, b):
+    chat_sessions.pop((min(a, b), max(a, b)), None)
+
+def collect_idle_chats(now):
+    """Pop every pair idle for CHAT_IDLE_TIMEOUT.
+
+    Activity only updates the session in memory; each pair keeps a single heap
+    entry that is pushed back to last activity + timeout when it comes due, so
+    a sweep touches only the sessions whose deadline has passed.
+    """
+    idle = []
+    while chat_deadlines and chat_deadlines[0][0] <= now:
+        deadline, pair = heapq.heappop(chat_deadlines)
+        session = chat_sessions.get(pair)
+        if session is None or session[1] != deadline:
+            continue
+        if session[0] + CHAT_IDLE_TIMEOUT <= now:
+            del chat_sessions[pair]
+            idle.append(pair)
+        else:
+            session[1] = session[0] + CHAT_IDLE_TIMEOUT
+            heapq.heappush(chat_deadlines, (session[1], pair))
+    return idle
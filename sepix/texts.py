@@ -0,0 +1,41 @@
+MEDIA_LABELS = {
+    'photo': 'عکس',
+    'animation': 'گیف',
+    'video': 'ویدیو',
+    'video_note': 'ویدیو مسیج',
+    'voice': 'پیام صوتی',
+    'audio': 'فایل صوتی',
+    'document': 'فایل',
+    'sticker': 'استیکر'
+}
+messages = {
+    "welcome": "سلام خوش اومدی!👋 اسمت چیه؟",
+    "already_registered": "قبلا ثبت نام کردی",
+    "complete_registration": "فراینده ثبت نام رو کامل کن لطفا",
+    "enter_age": "ممنون {name}! حالا بگو چند سالته (فقط عدد وارد کن)",
+    "invalid_age": "فقط عدد وارد کن لطفا",
+    "select_gender": "جنسیتت رو انتخاب کن👨👩",
+    "gender_registered": "ثبت نام انجام شد برای شروع چت روی دکمه (شروع چت) کلیک کن😉",
+    "no_users_available": "هیچ کاربری در دسترس نیست چند دقیقه دیگه دوباره تلاش کن🙏",
+    "select_user": "کاربر مورد نظرت رو برای چت انتخاب کن",
+    "request_sent": "درخواستت به کاربر ارسال شد منتظر جوابش باش",
+    "chat_request": "{sender_name} میخواد باهات چت کنه قبول میکنی🤔?",
+    "chat_accepted": "چت بین شما و {receiver_name} شروع شد",
+    "chat_rejected": "{receiver_name} درخواست چت رو رد کرد☹️",
+    "not_connected": "به هیچ کاربر متصل نیستی برای شروع چت روی دکمه (شروع چت) کلیک کن",
+    "chat_ended": "چت به پایان رسید🔚",
+    "chat_idle_ended": "چت به خاطر عدم فعالیت به پایان رسید🔚",
+    "exit_chat_to_continue": "برای انجام کار های دیگه اول باید از چت خارج بشی",
+    "exit_chat_to_use_command": "برای اینکه از گزینه های دیگه استفاده کنی باید از چت خارج بشی",
+    "info_prompt": "برای تغییر اطلاعات یکی از گزینه های زیر رو انتخاب کن",
+    "link_generated": "لینکت برای اشتراک گذاری:\n{link}",
+    "new_message_notification": "پیام جدید داری! برای دیدن پیام روی دکمه (پیام‌های جدید) کلیک کن",
+    "new_messages_notification": "{count} پیام جدید داری! برای دیدن پیام‌ها روی دکمه (پیام‌های جدید) کلیک کن",
+    "you_are_not_in_chat": "الان تو چت با هیچ کسی نیستی",
+    "message_sent": "پیامت ارسال شد به {owner_name}",
+    "reply_prompt": "پیامت رو وارد کن تا به {receiver_name} جواب بدی",
+    "reply_received": "جوابت به {sender_name} ارسال شد",
+    "search_results": "نتایج جستجو برای «{query}» (صفحه {page}):",
+    "search_no_results": "پیامی پیدا نشد",
+    "invalid_command": "دستور نامعتبر است."
+}
@@ -0,0 +1,24 @@
+FLOOD_RATE = 1.0
+FLOOD_BURST = 5
+FLOOD_IDLE_EVICT = 60
+flood_buckets = {}
+flood_stats = {'passed': 0, 'throttled': 0}
+
+def take_flood_token(chat_id, now):
+    """Token bucket per chat: FLOOD_BURST messages at once, refilled at FLOOD_RATE per second."""
+    tokens, last = flood_buckets.get(chat_id, (FLOOD_BURST, now))
+    tokens = min(FLOOD_BURST, tokens + (now - last) * FLOOD_RATE)
+    if tokens < 1:
+        flood_buckets[chat_id] = (tokens, now)
+        return False
+    flood_buckets[chat_id] = (tokens - 1, now)
+    return True
+
+def evict_idle_buckets(now):
+    """Drop buckets idle for FLOOD_IDLE_EVICT and return how many were dropped."""
+    # A bucket idle this long has refilled completely, so dropping it loses nothing.
+    cutoff = now - FLOOD_IDLE_EVICT
+    idle = [chat_id for chat_id, (_, last) in flood_buckets.items() if last < cutoff]
+    for chat_id in idle:
+        del flood_buckets[chat_id]
+    return len(idle)
@@ -0,0 +1,16 @@
+import pytest
+
+from sepix import db
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """Point sepix.db at a fresh database under tmp_path with the default settings."""
+    db.close_connections()
+    monkeypatch.setattr(db, 'db_path', str(tmp_path / 'test.db'))
+    monkeypatch.setattr(db, 'db_settings', db.load_db_settings({}))
+    db.user_cache.clear()
+    db.ensure_schema()
+    yield db.db_path
+    db.close_connections()
+    db.schema_checked.discard(db.db_path)
+    db.user_cache.clear()
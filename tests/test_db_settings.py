@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+from sepix import db
+
+def write_config(tmp_path, settings):
+    path = tmp_path / 'db.json'
+    path.write_text(json.dumps(settings), encoding='utf-8')
+    return str(path)
+
+def test_env_beats_file_beats_preset(tmp_path):
+    config = write_config(tmp_path, {'profile': 'durable', 'cache_size': -4000, 'synchronous': 'normal'})
+
+    settings = db.load_db_settings({'SEPIX_DB_CONFIG': config, 'SEPIX_DB_SYNCHRONOUS': 'off'})
+
+    assert settings == dict(db.DB_PRESETS['durable'], cache_size=-4000, synchronous='OFF')
+
+def test_env_profile_beats_file_profile(tmp_path):
+    config = write_config(tmp_path, {'profile': 'durable'})
+
+    assert db.load_db_settings({'SEPIX_DB_CONFIG': config, 'SEPIX_DB_PROFILE': 'fast'}) == db.DB_PRESETS['fast']
+
+@pytest.mark.parametrize("environ, file_settings", [
+    ({}, {'page_size': 4096}),
+    ({'SEPIX_DB_PROFILE': 'reckless'}, None),
+    ({'SEPIX_DB_CACHE_SIZE': 'lots'}, None),
+    ({'SEPIX_DB_JOURNAL_MODE': 'wal; DROP TABLE users'}, None),
+])
+def test_invalid_settings_raise(tmp_path, environ, file_settings):
+    if file_settings is not None:
+        environ = dict(environ, SEPIX_DB_CONFIG=write_config(tmp_path, file_settings))
+
+    with pytest.raises(ValueError):
+        db.load_db_settings(environ)
@@ -0,0 +1,124 @@
+"""Routing parity: the dict router must pick the handler the old filters did.
+
+The legacy_* functions reproduce the regex MessageHandlers, the
+CallbackQueryHandler patterns and the handle_callback startswith chain that
+route_message and route_callback replaced.
+"""
+import asyncio
+import re
+from types import SimpleNamespace
+
+import pytest
+
+from sepix import handlers
+
+LEGACY_TEXT_PATTERNS = [
+    ("^شروع چت$", 'handle_connect'),
+    ("^(مرد👨|زن👩|شانسی🎲)$", 'handle_gender_choice'),
+    ("^اتمام چت$", 'handle_end_chat'),
+    ("^اطلاعات شما$", 'show_user_info'),
+    ("^پیام‌های جدید$", 'handle_new_messages'),
+]
+
+LEGACY_CALLBACK_PATTERNS = [
+    (r"^\d+$", 'handle_user_selection'),
+    (r'^(accept|reject)_\d+$', 'handle_chat_response'),
+    (r'^search_\d+$', 'search_pagination_handler'),
+    (r'^(change_(name|age|gender)|prev_\d+|next_\d+|reply_\d+)$', 'handle_callback'),
+]
+
+def legacy_message_handler(text, user_data):
+    if text is not None:
+        for pattern, name in LEGACY_TEXT_PATTERNS:
+            if re.search(pattern, text):
+                return name
+    if 'reply_to' in user_data:
+        return 'receive_reply'
+    if 'awaiting_info' in user_data:
+        return 'process_user_info_change'
+    return 'relay_message'
+
+def legacy_callback_handler(data):
+    for pattern, name in LEGACY_CALLBACK_PATTERNS:
+        if re.match(pattern, data):
+            break
+    else:
+        return None
+    if name != 'handle_callback':
+        return name
+    if data.startswith('prev_') or data.startswith('next_'):
+        return 'pagination_handler'
+    if data.startswith('change_'):
+        return 'change_user_info'
+    return 'handle_reply_button'
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Replace every routed handler with a stub that records its name."""
+    calls = []
+
+    def recorder(name):
+        async def handler(update, context):
+            calls.append(name)
+        handler.__name__ = name
+        return handler
+
+    for label, handler in list(handlers.text_routes.items()):
+        monkeypatch.setitem(handlers.text_routes, label, recorder(handler.__name__))
+    for prefix, (handler, pattern) in list(handlers.callback_routes.items()):
+        monkeypatch.setitem(handlers.callback_routes, prefix, (recorder(handler.__name__), pattern))
+    for name in ('handle_user_selection', 'receive_reply', 'process_user_info_change', 'relay_message'):
+        monkeypatch.setattr(handlers, name, recorder(name))
+    return calls
+
+MESSAGE_CASES = [
+    ("شروع چت", {}),
+    ("مرد👨", {}),
+    ("زن👩", {}),
+    ("شانسی🎲", {}),
+    ("اتمام چت", {}),
+    ("اطلاعات شما", {}),
+    ("پیام‌های جدید", {}),
+    ("سلام", {}),
+    ("شروع چت ", {}),
+    (None, {}),
+    ("سلام", {'reply_to': 42}),
+    ("سلام", {'awaiting_info': 'name'}),
+    ("اتمام چت", {'reply_to': 42}),
+    (None, {'awaiting_info': 'age'}),
+]
+
+CALLBACK_CASES = [
+    "123", "prev_0", "next_2", "change_name", "change_age", "change_gender",
+    "reply_77", "accept_5", "reject_5", "search_1",
+    "reply_abc", "change_foo", "prev_", "next_-1", "accept_", "reject_x",
+    "search_a", "reply_1_2", "accept5", "gender_male", "unknown", "", "-5", "١٢",
+]
+
+@pytest.mark.parametrize("text, user_data", MESSAGE_CASES)
+def test_route_message_matches_legacy_filters(calls, text, user_data):
+    update = SimpleNamespace(effective_message=SimpleNamespace(text=text))
+    context = SimpleNamespace(user_data=dict(user_data))
+
+    asyncio.run(handlers.route_message(update, context))
+
+    assert calls == [legacy_message_handler(text, user_data)]
+
+@pytest.mark.parametrize("data", CALLBACK_CASES)
+def test_route_callback_matches_legacy_patterns(calls, data):
+    answers = []
+
+    async def answer(text=None):
+        answers.append(text)
+
+    update = SimpleNamespace(callback_query=SimpleNamespace(data=data, answer=answer))
+
+    asyncio.run(handlers.route_callback(update, SimpleNamespace(user_data={})))
+
+    expected = legacy_callback_handler(data)
+    if expected is None:
+        assert calls == []
+        assert answers == ["داده نامعتبر است."]
+    else:
+        assert calls == [expected]
+        assert answers == []
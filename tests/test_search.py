@@ -0,0 +1,66 @@
+from sepix import db
+
+ANONYMOUS = "کاربر ناشناس"
+
+def store(owner_id, text):
+    db.store_message(owner_id, 1, ANONYMOUS, text, 'text', None)
+
+def found(owner_id, text):
+    return [message for _, _, message in db.search_messages(owner_id, text, 10)]
+
+def test_search_negative_owner(temp_db):
+    store(-100, "hello group")
+    store(100, "hello user")
+
+    assert found(-100, "hello") == ["hello group"]
+    assert found(100, "hello") == ["hello user"]
+
+def test_owner_token_is_not_searchable(temp_db):
+    store(7, "hello")
+    store(-7, "hello")
+
+    assert found(7, "o7") == []
+    assert found(-7, db.owner_token(-7)) == []
+
+def test_results_never_cross_owners(temp_db):
+    for owner_id in (7, -7, 70, 77):
+        store(owner_id, f"shared words from {owner_id}")
+
+    for owner_id in (7, -7, 70, 77):
+        assert found(owner_id, "shared words") == [f"shared words from {owner_id}"]
+
+def test_index_follows_update_and_delete(temp_db):
+    store(7, "before")
+    store(7, "doomed")
+    with db.connect() as conn:
+        conn.execute("UPDATE messages SET message = 'after' WHERE message = 'before'")
+        conn.execute("DELETE FROM messages WHERE message = 'doomed'")
+        conn.commit()
+
+    assert found(7, "before") == []
+    assert found(7, "after") == ["after"]
+    assert found(7, "doomed") == []
+
+def test_old_owner_token_index_is_rebuilt(temp_db):
+    # Recreate the index as schema version 3 built it, with the raw 'o' || owner_id token.
+    with db.connect() as conn:
+        for trigger in ('messages_fts_insert', 'messages_fts_delete', 'messages_fts_update'):
+            conn.execute(f"DROP TRIGGER {trigger}")
+        conn.execute("DROP VIEW messages_fts_source")
+        conn.execute("DROP TABLE messages_fts")
+        conn.execute('''CREATE VIRTUAL TABLE messages_fts USING fts5(
+                            message, owner, content = 'messages_fts_source', content_rowid = 'id')''')
+        conn.execute('''CREATE VIEW messages_fts_source AS
+                        SELECT id, message, 'o' || owner_id AS owner FROM messages WHERE message IS NOT NULL''')
+        conn.execute('''INSERT INTO messages (owner_id, sender_id, sender_name, message, message_type)
+                        VALUES (-100, 1, ?, 'hello group', 'text')''', (ANONYMOUS,))
+        conn.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+        conn.execute("PRAGMA user_version = 3")
+        conn.commit()
+    db.schema_checked.discard(db.db_path)
+
+    db.ensure_schema()
+
+    assert found(-100, "hello") == ["hello group"]
+    store(-100, "hello again")
+    assert found(-100, "hello") == ["hello again", "hello group"]
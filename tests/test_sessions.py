@@ -0,0 +1,66 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from sepix import db, handlers, sessions
+
+@pytest.fixture
+def empty_sessions(monkeypatch):
+    monkeypatch.setattr(sessions, 'chat_sessions', {})
+    monkeypatch.setattr(sessions, 'chat_deadlines', [])
+
+def pair_users(temp_db):
+    for chat_id in range(1, 6):
+        db.save_user(chat_id, name=f"user{chat_id}", age=20, gender="مرد")
+    for a, b in [(1, 2), (3, 4)]:
+        db.save_user(a, chatting_with=b)
+        db.save_user(b, chatting_with=a)
+    # 4 leaves 3 for 5, so only 3 still points at the stale (3, 4) pair.
+    db.delete_chat_relation(4)
+    db.save_user(4, chatting_with=5)
+    db.save_user(5, chatting_with=4)
+
+def test_end_chats_clears_only_unchanged_sides(temp_db):
+    pair_users(temp_db)
+
+    assert db.end_chats([(1, 2), (3, 4)]) == [1, 2, 3]
+
+    assert [db.load_user(chat_id)[4] for chat_id in range(1, 6)] == [None, None, None, 5, 4]
+    assert sorted(db.load_idle_notices(10)) == [1, 2, 3]
+
+def test_collect_idle_chats_pushes_back_active_deadlines(empty_sessions):
+    timeout = sessions.CHAT_IDLE_TIMEOUT
+    sessions.track_chat(2, 1, 0)
+    sessions.track_chat(3, 4, 0)
+    sessions.touch_chat(1, 2, 1000)
+
+    assert sessions.collect_idle_chats(timeout) == [(3, 4)]
+    assert sessions.chat_sessions == {(1, 2): [1000, 1000 + timeout]}
+    assert sessions.chat_deadlines == [(1000 + timeout, (1, 2))]
+
+    assert sessions.collect_idle_chats(1000 + timeout - 1) == []
+    assert sessions.collect_idle_chats(1000 + timeout) == [(1, 2)]
+    assert sessions.chat_sessions == {} and sessions.chat_deadlines == []
+
+def test_sweep_notifies_only_unpaired_users(temp_db, empty_sessions, monkeypatch):
+    pair_users(temp_db)
+    sessions.track_chat(1, 2, -sessions.CHAT_IDLE_TIMEOUT)
+    sessions.track_chat(3, 4, -sessions.CHAT_IDLE_TIMEOUT)
+    sent = []
+
+    async def send_message(chat_id, text, reply_markup):
+        sent.append(chat_id)
+        # A user who starts a new chat before their notice goes out is skipped.
+        if chat_id == 1:
+            db.save_user(2, chatting_with=5)
+
+    async def no_sleep(delay):
+        pass
+
+    monkeypatch.setattr(handlers.asyncio, 'sleep', no_sleep)
+    bot = SimpleNamespace(send_message=send_message)
+    asyncio.run(handlers.sweep_idle_chats(SimpleNamespace(bot=bot)))
+
+    assert sorted(sent) == [1, 3]
+    assert db.load_idle_notices(10) == []
@@ -0,0 +1,44 @@
+"""The incremental counters must agree with a full recount after any mix of operations."""
+from sepix import db
+
+ANONYMOUS = "کاربر ناشناس"
+
+def recounted_stats():
+    with db.connect() as conn:
+        db.reconcile_stats(conn.cursor())
+        conn.commit()
+    return db.load_stats()
+
+def test_incremental_stats_match_reconcile(temp_db):
+    for chat_id, gender in [(1, "مرد"), (2, "زن"), (3, "مرد"), (4, "زن"), (5, "مرد")]:
+        db.save_user(chat_id, name=f"user{chat_id}", age=20 + chat_id, gender=gender)
+
+    db.save_user(1, gender="زن")
+    db.save_user(2, gender="زن")
+    db.save_user(3, name="renamed")
+
+    for a, b in [(1, 2), (3, 4)]:
+        db.save_user(a, chatting_with=b)
+        db.save_user(b, chatting_with=a)
+    db.delete_chat_relation(1)
+    db.delete_chat_relation(2)
+
+    # 4 leaves 3 for 5 before the idle sweep ends the stale (3, 4) pair.
+    db.delete_chat_relation(4)
+    db.save_user(4, chatting_with=5)
+    db.save_user(5, chatting_with=4)
+    assert db.end_chats([(3, 4)]) == [3]
+
+    for text in ["one", "two", "three"]:
+        db.store_message(2, 1, ANONYMOUS, text, 'text', None)
+    db.store_message(2, 1, "user1", "named", 'text', None)
+    db.store_message(4, 3, ANONYMOUS, "hello", 'text', None)
+    unread = db.load_unread_messages(2)
+    db.mark_messages_read(2, unread[1][0])
+
+    incremental = db.load_stats()
+    unread_counts = {owner_id: db.load_unread_count(owner_id) for owner_id in (2, 4)}
+
+    assert incremental == recounted_stats()
+    assert incremental == {'users': 5, 'male': 2, 'female': 3, 'chatting': 2, 'messages': 5, 'unread': 2}
+    assert unread_counts == {owner_id: db.load_unread_count(owner_id) for owner_id in (2, 4)} == {2: 1, 4: 1}
@@ -0,0 +1,18 @@
+import pytest
+
+from sepix import throttle
+
+@pytest.fixture(autouse=True)
+def empty_buckets(monkeypatch):
+    monkeypatch.setattr(throttle, 'flood_buckets', {})
+
+def test_burst_then_refill():
+    assert [throttle.take_flood_token(1, 0) for _ in range(throttle.FLOOD_BURST + 1)] == [True] * throttle.FLOOD_BURST + [False]
+    assert throttle.take_flood_token(1, 1 / throttle.FLOOD_RATE)
+
+def test_evict_idle_buckets_keeps_recent_ones():
+    throttle.take_flood_token(1, 0)
+    throttle.take_flood_token(2, 30)
+
+    assert throttle.evict_idle_buckets(throttle.FLOOD_IDLE_EVICT + 1) == 1
+    assert list(throttle.flood_buckets) == [2]